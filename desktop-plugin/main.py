@@ -3,16 +3,22 @@ import os
 import re
 import socket
 import winreg
+import time
+import functools
 import threading
 import requests
 import psutil
+from watchdog.observers import Observer
+from watchdog.events import FileSystemEventHandler
+from collections import deque
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
 from pathlib import Path
 from PyQt6.QtWidgets import (
     QApplication, QWidget, QVBoxLayout, QHBoxLayout,
-    QLabel, QPushButton, QSystemTrayIcon, QComboBox
+    QLabel, QPushButton, QSystemTrayIcon, QComboBox, QPlainTextEdit
 )
 from PyQt6.QtCore import Qt, QTimer, pyqtSignal, QObject
-from PyQt6.QtGui import QIcon, QPixmap
+from PyQt6.QtGui import QIcon, QPixmap, QKeySequence, QShortcut
 
 # Настройки
 GCODE_TEMP_FOLDERS = [
@@ -22,6 +28,197 @@ GCODE_TEMP_FOLDERS = [
 ESP32_PORTS = [80, 81]  # Порты для поиска катушек
 SCAN_TIMEOUT = 1.0
 HOLDER_PREFIX = "FD"
+SLICE_DEBOUNCE_MS = 700  # Ждём, пока слайсер допишет gcode
+
+# Метрики (включаются через FILAMIND_METRICS=1 или Ctrl+Shift+D в окне)
+METRICS_FILE = Path.home() / "AppData/Local/Filamind/metrics.prom"
+METRICS_PORT = 9464  # http://127.0.0.1:9464/metrics
+LATENCY_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+MAX_SPANS = 200
+
+
+class _NullSpan:
+    """Пустой спан, когда метрики выключены"""
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+_NULL_SPAN = _NullSpan()
+
+
+class _Span:
+    __slots__ = ("metrics", "name", "labels", "start")
+
+    def __init__(self, metrics, name, labels):
+        self.metrics = metrics
+        self.name = name
+        self.labels = labels
+        self.start = 0.0
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        duration = time.perf_counter() - self.start
+        self.metrics.record_span(self.name, duration, self.labels, exc_type is not None)
+        return False
+
+
+def _escape_label(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _format_labels(labels):
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{k}="{_escape_label(v)}"' for k, v in labels) + "}"
+
+
+class Metrics:
+    """Счётчики, гистограммы задержек и последние спаны.
+
+    Пока метрики выключены, span()/inc()/observe() сразу возвращаются.
+    """
+
+    def __init__(self):
+        self.enabled = os.environ.get("FILAMIND_METRICS") == "1"
+        self.lock = threading.Lock()
+        self.counters = {}
+        self.histograms = {}
+        self.spans = deque(maxlen=MAX_SPANS)
+        self.server = None
+        self.export_lock = threading.Lock()  # Экспорт зовут из нескольких потоков
+
+    def enable(self):
+        self.enabled = True
+        self.start_server()
+
+    def span(self, name, **labels):
+        """Таймер-контекст: with metrics.span("find_gcode"): ..."""
+        if not self.enabled:
+            return _NULL_SPAN
+        return _Span(self, name, labels)
+
+    def timed(self, name):
+        """Декоратор: замеряет время каждого вызова функции"""
+        def decorator(func):
+            @functools.wraps(func)
+            def wrapper(*args, **kwargs):
+                if not self.enabled:
+                    return func(*args, **kwargs)
+                with _Span(self, name, {}):
+                    return func(*args, **kwargs)
+            return wrapper
+        return decorator
+
+    def inc(self, name, value=1, **labels):
+        if not self.enabled:
+            return
+        key = (name, tuple(sorted(labels.items())))
+        with self.lock:
+            self.counters[key] = self.counters.get(key, 0) + value
+
+    def observe(self, name, value, **labels):
+        if not self.enabled:
+            return
+        key = (name, tuple(sorted(labels.items())))
+        with self.lock:
+            hist = self.histograms.get(key)
+            if hist is None:
+                # [накопительные бакеты, сумма, количество]
+                hist = self.histograms[key] = [[0] * len(LATENCY_BUCKETS), 0.0, 0]
+            for i, bound in enumerate(LATENCY_BUCKETS):
+                if value <= bound:
+                    hist[0][i] += 1
+            hist[1] += value
+            hist[2] += 1
+
+    def record_span(self, name, duration, labels, failed):
+        self.observe("filamind_span_duration_seconds", duration, span=name)
+        if failed:
+            self.inc("filamind_span_errors_total", span=name)
+        with self.lock:
+            self.spans.append((time.time(), name, duration, labels, failed))
+
+    def recent_spans(self):
+        with self.lock:
+            return list(self.spans)
+
+    def render(self):
+        """Текст в формате Prometheus exposition"""
+        with self.lock:
+            counters = sorted(self.counters.items())
+            histograms = sorted(
+                (key, (list(h[0]), h[1], h[2])) for key, h in self.histograms.items()
+            )
+
+        lines = []
+        typed = set()
+        for (name, labels), value in counters:
+            if name not in typed:
+                lines.append(f"# TYPE {name} counter")
+                typed.add(name)
+            lines.append(f"{name}{_format_labels(labels)} {value}")
+
+        for (name, labels), (buckets, total, count) in histograms:
+            if name not in typed:
+                lines.append(f"# TYPE {name} histogram")
+                typed.add(name)
+            for bound, bucket in zip(LATENCY_BUCKETS, buckets):
+                lines.append(f"{name}_bucket{_format_labels(labels + (('le', bound),))} {bucket}")
+            lines.append(f"{name}_bucket{_format_labels(labels + (('le', '+Inf'),))} {count}")
+            lines.append(f"{name}_sum{_format_labels(labels)} {total:.6f}")
+            lines.append(f"{name}_count{_format_labels(labels)} {count}")
+
+        return "\n".join(lines) + "\n"
+
+    def export(self):
+        """Записывает метрики в METRICS_FILE (для node_exporter textfile collector)"""
+        if not self.enabled:
+            return
+        with self.export_lock:
+            try:
+                METRICS_FILE.parent.mkdir(parents=True, exist_ok=True)
+                tmp = METRICS_FILE.with_suffix(".tmp")
+                tmp.write_text(self.render(), encoding="utf-8")
+                os.replace(tmp, METRICS_FILE)
+            except OSError:
+                pass
+
+    def start_server(self):
+        """Поднимает локальный /metrics на 127.0.0.1:METRICS_PORT"""
+        if self.server is not None:
+            return
+        metrics = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path != "/metrics":
+                    self.send_error(404)
+                    return
+                body = metrics.render().encode("utf-8")
+                self.send_response(200)
+                self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *args):
+                pass
+
+        try:
+            self.server = ThreadingHTTPServer(("127.0.0.1", METRICS_PORT), Handler)
+        except OSError:
+            # Порт занят — остаёмся только с файлом
+            return
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+
+
+metrics = Metrics()
 
 
 class SpoolHolder:
@@ -119,6 +316,7 @@ def get_local_ip():
     return primary_ip
 
 
+@metrics.timed("scan_network")
 def scan_network_for_holders(callback):
     """Сканирует несколько наиболее вероятных подсетей"""
     # Получаем основной IP
@@ -138,11 +336,15 @@ def scan_network_for_holders(callback):
     found_lock = threading.Lock()
 
     def check_ip_port(ip, port):
+        metrics.inc("filamind_probes_total", stage="scan")
+        start = time.perf_counter()
         try:
             response = requests.get(f"http://{ip}:{port}/data", timeout=SCAN_TIMEOUT)
             data = response.json()
             name = data.get('name', '')
             if 'net' in data and name.upper().startswith(HOLDER_PREFIX):
+                metrics.observe("filamind_holder_latency_seconds",
+                                time.perf_counter() - start, holder=f"{ip}:{port}")
                 holder = SpoolHolder(
                     ip=f"{ip}:{port}",
                     name=name,
@@ -157,8 +359,10 @@ def scan_network_for_holders(callback):
                 )
                 with found_lock:
                     found.append(holder)
-        except:
-            pass
+        except requests.Timeout:
+            metrics.inc("filamind_probe_timeouts_total", stage="scan")
+        except Exception:
+            metrics.inc("filamind_probe_errors_total", stage="scan")
 
     # Ограничиваем количество одновременных потоков
     max_threads = 30
@@ -186,13 +390,20 @@ def scan_network_for_holders(callback):
     for t in threads:
         t.join()
 
+    metrics.inc("filamind_holders_found_total", len(found))
     callback(found)
 
 
-def get_holder_data(ip_port):
+def get_holder_data(ip_port, stage="refresh"):
+    metrics.inc("filamind_probes_total", stage=stage)
+    # Известные катушки считаем поштучно, чтобы была видна «мёртвая»
+    labels = {"stage": stage, "holder": ip_port} if stage == "refresh" else {"stage": stage}
+    start = time.perf_counter()
     try:
         response = requests.get(f"http://{ip_port}/data", timeout=1)
         data = response.json()
+        metrics.observe("filamind_holder_latency_seconds",
+                        time.perf_counter() - start, holder=ip_port)
         return SpoolHolder(
             ip=ip_port,
             name=data.get('name', ''),
@@ -205,15 +416,31 @@ def get_holder_data(ip_port):
             density=data.get('density', 1.24),
             weight=data.get('weight', 1000.0),
         )
-    except:
+    except requests.Timeout:
+        metrics.inc("filamind_probe_timeouts_total", **labels)
+        if stage == "refresh":
+            metrics.observe("filamind_holder_latency_seconds",
+                            time.perf_counter() - start, holder=ip_port)
+        return None
+    except Exception:
+        metrics.inc("filamind_probe_errors_total", **labels)
         return None
 
 
-def parse_gcode(filepath):
-    """Парсит G-code и ищет вес филамента и имя модели"""
+@metrics.timed("parse_gcode")
+def parse_gcode(filepath, cancel=None):
+    """Парсит G-code и ищет вес филамента и имя модели.
+
+    Если cancel (threading.Event) выставлен, прерывается между проходами и возвращает (None, None).
+    """
+    def cancelled():
+        return cancel is not None and cancel.is_set()
+
     try:
         with open(filepath, 'r', encoding='utf-8', errors='ignore') as f:
             content = f.read()
+        if cancelled():
+            return None, None
 
         # Ищем имя модели из "; printing object XXX.stl id:0"
         model_names = []
@@ -223,23 +450,29 @@ def parse_gcode(filepath):
                 model_names.append(name)
 
         model_name = ", ".join(model_names) if model_names else None
+        if cancelled():
+            return None, None
 
         # Ищем вес в конце файла
         weight = None
         match = re.search(r';\s*filament used \[g\]\s*=\s*([\d.]+)', content, re.IGNORECASE)
         if match:
             weight = float(match.group(1))
+        elif cancelled():
+            return None, None
         else:
             match = re.search(r';Filament used:\s*([\d.]+)\s*g', content, re.IGNORECASE)
             if match:
                 weight = float(match.group(1))
 
         return weight, model_name
-    except:
+    except (OSError, ValueError):
+        metrics.inc("filamind_parse_errors_total")
         return None, None
 
 
-def find_active_gcode():
+@metrics.timed("find_gcode")
+def find_active_gcode(cancel=None):
     """Находит gcode активной модели по самой свежей папке"""
     latest_file = None
     latest_mtime = 0
@@ -251,6 +484,8 @@ def find_active_gcode():
 
         # Ищем все gcode файлы
         for root, dirs, files in os.walk(folder):
+            if cancel is not None and cancel.is_set():
+                return None, 0
             for f in files:
                 if f.endswith('.gcode'):
                     filepath = os.path.join(root, f)
@@ -263,15 +498,121 @@ def find_active_gcode():
                         if mtime > latest_mtime:
                             latest_mtime = mtime
                             latest_file = filepath
-                    except:
+                    except OSError:
                         pass
 
     return latest_file, latest_mtime
 
 
+class CheckPipeline:
+    """Граф этапов проверки: этапы независимы и выполняются параллельно.
+
+    Результат каждого этапа уходит в on_done(name, result) сразу по готовности.
+    Повторный запуск этапа отменяет его незавершённый предыдущий запуск —
+    устаревший результат не доставляется.
+    """
+
+    def __init__(self, stages, on_done):
+        self.stages = stages  # name -> func(cancel_event, *args) -> result (None = отменён)
+        self.on_done = on_done
+        self.lock = threading.Lock()
+        self.running = {}  # name -> Event отмены текущего запуска
+
+    def run(self, names=None, args=None):
+        """args: name -> кортеж аргументов этапа, снятый в UI-потоке"""
+        args = args or {}
+        for name in names or self.stages:
+            cancel = threading.Event()
+            with self.lock:
+                prev = self.running.get(name)
+                if prev:
+                    prev.set()
+                    metrics.inc("filamind_stage_cancelled_total", stage=name)
+                self.running[name] = cancel
+            threading.Thread(
+                target=self._run_stage,
+                args=(name, cancel, args.get(name, ())),
+                daemon=True
+            ).start()
+
+    def cancel(self, name):
+        """Отменяет незавершённый запуск этапа — его результат не будет доставлен"""
+        with self.lock:
+            cancel = self.running.pop(name, None)
+        if cancel:
+            cancel.set()
+            metrics.inc("filamind_stage_cancelled_total", stage=name)
+
+    def is_running(self, name=None):
+        with self.lock:
+            return name in self.running if name else bool(self.running)
+
+    def _run_stage(self, name, cancel, args):
+        result = None
+        try:
+            with metrics.span(name):
+                result = self.stages[name](cancel, *args)
+        except Exception:
+            # Упавший этап отдаёт None, чтобы UI не остался в «Проверка...»
+            result = None
+        finally:
+            with self.lock:
+                # Запуск мог быть вытеснен более новым — тогда результат устарел
+                if self.running.get(name) is cancel:
+                    del self.running[name]
+                    # Отдаём под локом, чтобы более новый запуск не обогнал этот
+                    self.on_done(name, result)
+            # Экспорт после закрытия спана, чтобы в файле был и этот этап
+            metrics.export()
+
+
+class SliceWatcher(FileSystemEventHandler):
+    """Следит за папками слайсера и сообщает о новых/изменённых .gcode"""
+
+    def __init__(self, callback):
+        super().__init__()
+        self.callback = callback
+        self.observer = Observer()
+        self.observer.daemon = True
+        self.watched = {}  # папка -> ObservedWatch
+
+    def start(self):
+        self.watch_folders()
+        self.observer.start()
+
+    def watch_folders(self):
+        """Подключает папки, которые появились после запуска"""
+        for folder in GCODE_TEMP_FOLDERS:
+            exists = os.path.exists(folder)
+            watch = self.watched.get(folder)
+            if watch is not None:
+                if exists:
+                    continue
+                # Папку удалили — watchdog её больше не видит, снимаем и ждём пересоздания
+                try:
+                    self.observer.unschedule(watch)
+                except (KeyError, OSError):
+                    pass
+                del self.watched[folder]
+            if not exists:
+                continue
+            try:
+                self.watched[folder] = self.observer.schedule(self, folder, recursive=True)
+            except OSError:
+                pass
+
+    def on_any_event(self, event):
+        if event.is_directory or event.event_type not in ("created", "modified", "moved"):
+            return
+        path = getattr(event, "dest_path", "") or event.src_path
+        if path.endswith('.gcode'):
+            self.callback(path)
+
+
 class Signals(QObject):
     update_ui = pyqtSignal()
-    holders_found = pyqtSignal(list)
+    stage_done = pyqtSignal(str, object)
+    slice_detected = pyqtSignal(str)
 
 
 class FilamindCheckerWidget(QWidget):
@@ -285,10 +626,28 @@ class FilamindCheckerWidget(QWidget):
         self.selected_holder = None
         self.signals = Signals()
         self.signals.update_ui.connect(self.update_display)
-        self.signals.holders_found.connect(self.on_holders_found)
+        self.signals.stage_done.connect(self.on_stage_done)
+        self.signals.slice_detected.connect(self.on_slice_detected)
+        self.debug_panel = None
+        self.weight_missing = False
+        self.gcode_from_slice = False
+        self.pipeline = CheckPipeline(
+            {
+                "scan_holders": self.scan_holders_stage,
+                "refresh_holders": self.refresh_holders_stage,
+                "load_gcode": self.load_gcode_stage,
+            },
+            lambda name, result: self.signals.stage_done.emit(name, result),
+        )
+        # Слайсер пишет файл кусками — запускаем проверку после паузы в событиях
+        self.slice_timer = QTimer(self)
+        self.slice_timer.setSingleShot(True)
+        self.slice_timer.timeout.connect(self.on_new_slice)
+        self.slice_watcher = SliceWatcher(lambda path: self.signals.slice_detected.emit(path))
         self.init_ui()
         self.init_tray()
         self.scan_holders()
+        self.slice_watcher.start()
 
     def init_ui(self):
         self.setWindowTitle("Filamind Checker")
@@ -422,6 +781,10 @@ class FilamindCheckerWidget(QWidget):
         self.length_label.setMinimumHeight(20)  # Минимальная высота для текста
         layout.addWidget(self.length_label)
 
+        # Скрытая панель отладки
+        debug_shortcut = QShortcut(QKeySequence("Ctrl+Shift+D"), self)
+        debug_shortcut.activated.connect(self.toggle_debug_panel)
+
         # Позиция
         screen = QApplication.primaryScreen().geometry()
         self.move(screen.width() - 380, 100)
@@ -434,14 +797,24 @@ class FilamindCheckerWidget(QWidget):
         self.tray.setToolTip("Filamind Checker")
         self.tray.show()
 
+    def toggle_debug_panel(self):
+        """Ctrl+Shift+D — показывает последние спаны (и включает метрики)"""
+        if self.debug_panel is None:
+            metrics.enable()
+            self.debug_panel = DebugPanel()
+        if self.debug_panel.isVisible():
+            self.debug_panel.hide()
+        else:
+            self.debug_panel.move(self.x(), self.y() + self.height() + 10)
+            self.debug_panel.show()
+
     def scan_holders(self):
         self.holder_combo.clear()
         self.holder_combo.addItem("Поиск...")
-        threading.Thread(
-            target=scan_network_for_holders,
-            args=(lambda h: self.signals.holders_found.emit(h),),
-            daemon=True
-        ).start()
+        # Полное сканирование заменяет обновление — результат обновления устарел бы
+        self.pipeline.cancel("refresh_holders")
+        self.pipeline.run(["scan_holders"])
+        self.update_check_button()
 
     def on_holders_found(self, holders):
         # Сохраняем текущий выбор до обновления списка
@@ -476,8 +849,6 @@ class FilamindCheckerWidget(QWidget):
                 self.holder_combo.setCurrentIndex(0)
 
         self.holder_combo.blockSignals(False)
-        self.check_btn.setEnabled(True)
-        self.check_btn.setText("Проверить")
         self.update_display()
 
     def on_holder_selected(self, index):
@@ -487,55 +858,126 @@ class FilamindCheckerWidget(QWidget):
 
     def do_check(self):
         """Кнопка проверки — обновление данных катушек + поиск gcode"""
-        self.check_btn.setEnabled(False)
-        self.check_btn.setText("Проверка...")
         self.status_label.setText("Обновление данных...")
         self.status_label.setStyleSheet("font-size: 14px; font-weight: bold; color: #888;")
+        stages = ["load_gcode"]
+        # Идущее сканирование сети само принесёт свежие катушки
+        if not self.pipeline.is_running("scan_holders"):
+            stages.append("refresh_holders")
+        self.start_check(stages)
+
+    def on_slice_detected(self, path):
+        self.slice_timer.start(SLICE_DEBOUNCE_MS)
+
+    def on_new_slice(self):
+        """Новый слайс: перечитываем gcode, катушки обновляем, если ещё не обновляются"""
+        if not self.isVisible():
+            return
+        stages = ["load_gcode"]
+        # Без катушек quick_scan не запускаем — показываем результат сканирования как есть
+        if self.holders and not self.holders_updating():
+            stages.append("refresh_holders")
+        self.start_check(stages, from_slice=True)
+
+    def start_check(self, stages, from_slice=False):
+        """Запускает этапы, передавая им снимок состояния из UI-потока"""
+        args = {}
+        if "load_gcode" in stages:
+            self.gcode_from_slice = from_slice
+            args["load_gcode"] = ((self.last_file, self.last_mtime, self.required, self.model_name),)
+        if "refresh_holders" in stages:
+            args["refresh_holders"] = (list(self.holders),)
+        self.pipeline.run(stages, args)
+        self.update_check_button()
+
+    def holders_updating(self):
+        return self.pipeline.is_running("scan_holders") or self.pipeline.is_running("refresh_holders")
+
+    def scan_holders_stage(self, cancel):
+        """Этап: полное сканирование сети"""
+        found = []
+        scan_network_for_holders(found.extend)
+        return found
+
+    def refresh_holders_stage(self, cancel, holders):
+        """Этап: опрос известных катушек (или быстрый поиск, если их нет)"""
+        updated_holders = []
+        for holder in holders:
+            if cancel.is_set():
+                return None
+            updated_holder = get_holder_data(holder.ip)
+            if updated_holder:
+                updated_holders.append(updated_holder)
+            else:
+                # Если катушка не отвечает, оставляем старые данные
+                updated_holders.append(holder)
 
-        def check_thread():
-            # Обновляем данные существующих катушек
-            updated_holders = []
-            for holder in self.holders:
-                updated_holder = get_holder_data(holder.ip)
-                if updated_holder:
-                    updated_holders.append(updated_holder)
-                else:
-                    # Если катушка не отвечает, оставляем старые данные
-                    updated_holders.append(holder)
-
-            # Если катушек нет, делаем быстрое сканирование популярных IP
-            if not updated_holders:
+        # Если катушек нет, делаем быстрое сканирование популярных IP
+        if not updated_holders:
+            with metrics.span("quick_scan"):
                 # Пробуем популярные подсети и IP адреса
                 common_targets = [
                     "192.168.1.12", "192.168.1.10", "192.168.1.11", "192.168.1.1",
                     "192.168.0.12", "192.168.0.10", "192.168.0.11", "192.168.0.1",
                     "10.0.0.12", "10.0.0.10", "10.0.0.11", "10.0.0.1"
                 ]
-                
+
                 for ip in common_targets:
                     for port in ESP32_PORTS:
-                        holder = get_holder_data(f"{ip}:{port}")
+                        if cancel.is_set():
+                            return None
+                        holder = get_holder_data(f"{ip}:{port}", stage="quick_scan")
                         if holder:
                             updated_holders.append(holder)
                             break  # Нашли катушку, можно остановиться
 
-            # Ищем активный gcode
-            filepath, mtime = find_active_gcode()
-            if filepath:
-                weight, model_name = parse_gcode(filepath)
-                if weight:
-                    self.required = weight
-                    self.model_name = model_name or ""
-                    self.last_file = filepath
-                    self.last_mtime = mtime
-
-            self.signals.holders_found.emit(updated_holders)
+        return updated_holders
+
+    def load_gcode_stage(self, cancel, cached):
+        """Этап: поиск активного gcode и парсинг веса.
+
+        cached — (файл, mtime, вес, модель) прошлой проверки. Возвращает такой же кортеж
+        (вес None, если в файле его нет) или None, если gcode не найден.
+        """
+        last_file, last_mtime, required, _ = cached
+        filepath, mtime = find_active_gcode(cancel)
+        if not filepath or cancel.is_set():
+            return None
+        if filepath == last_file and mtime == last_mtime and required:
+            # Файл не менялся с прошлой проверки — не парсим заново
+            metrics.inc("filamind_gcode_cache_hits_total")
+            return cached
+        metrics.inc("filamind_gcode_cache_misses_total")
+        weight, model_name = parse_gcode(filepath, cancel)
+        return filepath, mtime, weight, model_name or ""
+
+    def on_stage_done(self, name, result):
+        """Частичный результат этапа — сразу показываем"""
+        if name in ("scan_holders", "refresh_holders"):
+            if result is not None:
+                self.on_holders_found(result)
+            else:
+                # Этап упал — оставляем прежний список катушек
+                self.update_display()
+            return
+        if name == "load_gcode":
+            if result and result[2]:
+                self.last_file, self.last_mtime, self.required, self.model_name = result
+                self.weight_missing = False
+            elif result or self.gcode_from_slice:
+                # Файл недописан или без строки веса — вердикт прошлой модели не показываем
+                self.required = 0.0
+                self.model_name = ""
+                self.weight_missing = True
+        self.update_display()
 
-        threading.Thread(target=check_thread, daemon=True).start()
+    def update_check_button(self):
+        busy = self.pipeline.is_running()
+        self.check_btn.setEnabled(not busy)
+        self.check_btn.setText("Проверка..." if busy else "Проверить")
 
     def update_display(self):
-        self.check_btn.setEnabled(True)
-        self.check_btn.setText("Проверить")
+        self.update_check_button()
 
         available = self.selected_holder.net if self.selected_holder else 0
         required = self.required
@@ -597,27 +1039,36 @@ class FilamindCheckerWidget(QWidget):
         percent_remaining = (available / initial_weight) * 100 if available > 0 and initial_weight > 0 else 0
 
         if required and available:
+            # Вес катушки ещё обновляется — вердикт по старым данным
+            provisional = " (обновление катушки...)" if self.holders_updating() else ""
             if available >= required:
                 self.status_label.setText("✓ ХВАТИТ")
                 self.status_label.setStyleSheet("font-size: 18px; font-weight: bold; color: #4CAF50;")
-                self.percent_label.setText(f"Осталось: {percent_remaining:.0f}%")
+                self.percent_label.setText(f"Осталось: {percent_remaining:.0f}%{provisional}")
                 self.percent_label.setStyleSheet("font-size: 14px; color: #4CAF50;")
             else:
                 deficit = round(required - available, 2)
                 self.status_label.setText(f"✗ НЕ ХВАТИТ (-{deficit}г)")
                 self.status_label.setStyleSheet("font-size: 18px; font-weight: bold; color: #f44336;")
-                self.percent_label.setText(f"Осталось: {percent_remaining:.0f}%")
+                self.percent_label.setText(f"Осталось: {percent_remaining:.0f}%{provisional}")
                 self.percent_label.setStyleSheet("font-size: 14px; color: #f44336;")
         elif required and not available:
             self.status_label.setText(f"Нужно: {required}г")
             self.status_label.setStyleSheet("font-size: 16px; font-weight: bold; color: #ff9800;")
             self.percent_label.setText("")
+        elif self.weight_missing:
+            self.status_label.setText("Нет данных о весе")
+            self.status_label.setStyleSheet("font-size: 14px; font-weight: bold; color: #ff9800;")
+            self.percent_label.setText("")
         elif not self.selected_holder:
             self.status_label.setText("Катушки не найдены")
             self.status_label.setStyleSheet("font-size: 14px; font-weight: bold; color: #888;")
             self.percent_label.setText("")
         else:
-            self.status_label.setText("Нажмите 'Проверить'")
+            if self.pipeline.is_running():
+                self.status_label.setText("Обновление данных...")
+            else:
+                self.status_label.setText("Нажмите 'Проверить'")
             self.status_label.setStyleSheet("font-size: 14px; font-weight: bold; color: #888;")
             if available > 0:
                 self.percent_label.setText(f"Осталось: {percent_remaining:.0f}%")
@@ -634,6 +1085,56 @@ class FilamindCheckerWidget(QWidget):
             self.move(event.globalPosition().toPoint() - self.drag_pos)
 
 
+class DebugPanel(QWidget):
+    """Окно с последними спанами и текущими метриками"""
+
+    def __init__(self):
+        super().__init__()
+        self.setWindowTitle("Filamind Debug")
+        self.setWindowFlags(Qt.WindowType.WindowStaysOnTopHint | Qt.WindowType.Tool)
+        self.resize(480, 360)
+        self.setStyleSheet("""
+            QWidget { background-color: #2b2b2b; color: white; }
+            QPlainTextEdit {
+                background-color: #353535;
+                border: none;
+                font-family: Consolas, monospace;
+                font-size: 11px;
+            }
+        """)
+
+        layout = QVBoxLayout(self)
+        layout.setContentsMargins(8, 8, 8, 8)
+        self.text = QPlainTextEdit()
+        self.text.setReadOnly(True)
+        layout.addWidget(self.text)
+
+        self.timer = QTimer(self)
+        self.timer.timeout.connect(self.refresh)
+
+    def showEvent(self, event):
+        self.refresh()
+        self.timer.start(1000)
+        super().showEvent(event)
+
+    def hideEvent(self, event):
+        self.timer.stop()
+        super().hideEvent(event)
+
+    def refresh(self):
+        lines = []
+        for ts, name, duration, labels, failed in reversed(metrics.recent_spans()):
+            stamp = time.strftime("%H:%M:%S", time.localtime(ts))
+            extra = " ".join(f"{k}={v}" for k, v in labels.items())
+            mark = " ERR" if failed else ""
+            lines.append(f"{stamp}  {name:<16} {duration * 1000:8.1f} мс {extra}{mark}")
+        if not lines:
+            lines.append("Спанов пока нет — нажмите 'Проверить'")
+        lines.append("")
+        lines.append(metrics.render())
+        self.text.setPlainText("\n".join(lines))
+
+
 def is_creality_running():
     """Проверяет запущен ли Creality Print"""
     for proc in psutil.process_iter(['name']):
@@ -652,6 +1153,9 @@ def main():
     if not is_in_startup():
         add_to_startup()
 
+    if metrics.enabled:
+        metrics.start_server()
+
     widget = FilamindCheckerWidget()
 
     # Показываем только если Creality запущен
@@ -661,6 +1165,7 @@ def main():
     # Таймер проверки Creality каждые 3 сек
     def check_creality():
         if is_creality_running():
+            widget.slice_watcher.watch_folders()
             if not widget.isVisible():
                 widget.show()
                 widget.scan_holders()
@@ -669,6 +1174,7 @@ def main():
                 widget.hide()
                 widget.required = 0.0
                 widget.model_name = ""
+                widget.weight_missing = False
                 widget.update_display()
 
     creality_timer = QTimer()